@@ -0,0 +1,197 @@
+import abc
+import asyncio
+from abc import ABCMeta
+from concurrent.futures import Executor
+from typing import Any, List, Optional, Tuple
+
+from rsocket_broker.exceptions import RSocketBrokerException
+from rsocket_broker.frame import AddressFrame
+from rsocket_broker.frame_helpers import parse_key_value_map, serialize_key_value
+
+_ENCRYPT = 0
+_DECRYPT = 1
+
+
+class AddressCipher(metaclass=ABCMeta):
+    """
+    Encrypts the tag block and metadata of AddressFrames.
+
+    Implementations are called from executor workers and must be thread safe
+    (and picklable, when used with a process pool).
+    """
+
+    @abc.abstractmethod
+    def encrypt(self, plaintext: bytes) -> bytes:
+        ...
+
+    @abc.abstractmethod
+    def decrypt(self, ciphertext: bytes) -> bytes:
+        ...
+
+
+class AddressFrameCipherExecutor:
+    """
+    Runs AddressFrame encryption and decryption, including serializing and parsing the tag block,
+    in an executor, outside the event loop.
+
+    Payloads submitted in the same loop iteration are grouped into executor submissions of up to
+    max_batch_size payloads and max_batch_bytes in total. Larger payloads are submitted alone.
+    An executor of None uses the event loop's default executor.
+    """
+
+    __slots__ = (
+        '_cipher',
+        '_executor',
+        '_max_batch_size',
+        '_max_batch_bytes',
+        '_pending',
+        '_pending_bytes',
+        '_flush_scheduled'
+    )
+
+    def __init__(self,
+                 cipher: AddressCipher,
+                 executor: Optional[Executor] = None,
+                 max_batch_size: int = 64,
+                 max_batch_bytes: int = 4096):
+        if max_batch_size < 1 or max_batch_bytes < 1:
+            raise RSocketBrokerException('Batch limits must be positive: {} payloads, {} bytes'.format(
+                max_batch_size, max_batch_bytes))
+
+        self._cipher = cipher
+        self._executor = executor
+        self._max_batch_size = max_batch_size
+        self._max_batch_bytes = max_batch_bytes
+        self._pending: List[Tuple[int, Any, asyncio.Future]] = []
+        self._pending_bytes = 0
+        self._flush_scheduled = False
+
+    async def encrypt(self, frame: AddressFrame) -> AddressFrame:
+        """Returns an encrypted copy of the frame; the given frame is left unchanged."""
+
+        if frame.flag_encrypted:
+            return frame
+
+        key_value_map = dict(frame.key_value_map)
+        size = _plaintext_size(key_value_map, frame.metadata)
+        encrypted = _copy_address_frame(frame)
+        encrypted.encrypted_payload = await self._submit(_ENCRYPT, (key_value_map, frame.metadata), size)
+        encrypted.flag_encrypted = True
+        return encrypted
+
+    async def decrypt(self, frame: AddressFrame) -> AddressFrame:
+        """Returns a decrypted copy of the frame; the given frame is left unchanged."""
+
+        if not frame.flag_encrypted:
+            return frame
+
+        payload = frame.encrypted_payload
+        decrypted = _copy_address_frame(frame)
+        decrypted.key_value_map, decrypted.metadata = await self._submit(_DECRYPT, payload, len(payload))
+        return decrypted
+
+    def _submit(self, operation: int, payload: Any, size: int) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        if size >= self._max_batch_bytes:
+            self._run_batch(loop, [(operation, payload, future)])
+            return future
+
+        if self._pending_bytes + size > self._max_batch_bytes:
+            self._flush()
+
+        self._pending.append((operation, payload, future))
+        self._pending_bytes += size
+
+        if len(self._pending) >= self._max_batch_size or self._pending_bytes >= self._max_batch_bytes:
+            self._flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_soon(self._flush)
+
+        return future
+
+    def _flush(self):
+        self._flush_scheduled = False
+
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        self._pending_bytes = 0
+        self._run_batch(asyncio.get_running_loop(), batch)
+
+    def _run_batch(self, loop: asyncio.AbstractEventLoop, batch: List[Tuple[int, Any, asyncio.Future]]):
+        requests = [(operation, payload) for operation, payload, _ in batch]
+        futures = [future for _, _, future in batch]
+
+        executor_future = loop.run_in_executor(self._executor, _apply_cipher_batch, self._cipher, requests)
+        executor_future.add_done_callback(lambda done: _complete_batch(done, futures))
+
+
+def _plaintext_size(key_value_map: dict, metadata: bytes) -> int:
+    size = len(metadata)
+
+    for key, value in key_value_map.items():
+        size += 2 + len(value or b'')
+
+        if isinstance(key, (bytes, bytearray)):
+            size += len(key)
+
+    return size
+
+
+def _copy_address_frame(frame: AddressFrame) -> AddressFrame:
+    copy = AddressFrame()
+    copy.origin_route_id = frame.origin_route_id
+    copy.flag_unicast = frame.flag_unicast
+    copy.flag_multicast = frame.flag_multicast
+    copy.flag_shared_routing = frame.flag_shared_routing
+    return copy
+
+
+def _apply_cipher_batch(cipher: AddressCipher, requests: List[Tuple[int, Any]]) -> List[Any]:
+    """
+    Encrypt requests carry (key_value_map, metadata) and result in the ciphertext.
+    Decrypt requests carry the ciphertext and result in (key_value_map, metadata).
+    """
+
+    results = []
+
+    for operation, payload in requests:
+        try:
+            if operation == _ENCRYPT:
+                key_value_map, metadata = payload
+                results.append(cipher.encrypt(serialize_key_value(key_value_map) + metadata))
+            else:
+                plaintext = cipher.decrypt(payload)
+                key_value_map, offset = parse_key_value_map(plaintext, 0)
+                results.append((key_value_map, plaintext[offset:]))
+        except Exception as exception:
+            results.append(exception)
+
+    return results
+
+
+def _complete_batch(executor_future: asyncio.Future, futures: List[asyncio.Future]):
+    if executor_future.cancelled():
+        for future in futures:
+            future.cancel()
+        return
+
+    exception = executor_future.exception()
+
+    if exception is not None:
+        results = [exception] * len(futures)
+    else:
+        results = executor_future.result()
+
+    for future, result in zip(futures, results):
+        if future.done():
+            continue
+
+        if isinstance(result, Exception):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
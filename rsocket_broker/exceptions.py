@@ -4,3 +4,7 @@ class RSocketBrokerException(Exception):
 
 class RSocketBrokerUnknownKey(RSocketBrokerException):
     pass
+
+
+class RSocketBrokerUnknownTagIndex(RSocketBrokerException):
+    pass
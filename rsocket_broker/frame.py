@@ -9,6 +9,7 @@ from rsocket.exceptions import RSocketProtocolError, ParseError, RSocketUnknownF
 from rsocket.frame_helpers import (is_flag_set, unpack_string, pack_string)
 
 from rsocket_broker.frame_helpers import parse_key_value_map, serialize_key_value
+from rsocket_broker.tag_table import TagTable
 
 PROTOCOL_MAJOR_VERSION = 0
 PROTOCOL_MINOR_VERSION = 1
@@ -51,6 +52,7 @@ def parse_header(frame: Header, buffer: bytes, offset: int) -> int:
     flags |= (frame.frame_type & 3) << 8
     frame_type_id = frame.frame_type >> 2
     frame.frame_type = FrameType(frame_type_id)
+    frame.flags_ignore = False  # Broker frames define no ignore flag.
     return flags
 
 
@@ -242,6 +244,7 @@ class AddressFrame(Frame):
         'flag_multicast',
         'flag_shared_routing',
         'metadata',
+        'encrypted_payload',
     )
 
     def __init__(self):
@@ -253,8 +256,9 @@ class AddressFrame(Frame):
         self.flag_shared_routing = False
         self.key_value_map = {}
         self.metadata = b''
+        self.encrypted_payload = b''
 
-    def parse(self, buffer, offset: int):
+    def parse(self, buffer, offset: int, tag_table: Optional[TagTable] = None):
         flags = parse_header(self, buffer, offset)
         offset += HEADER_LENGTH
 
@@ -265,12 +269,20 @@ class AddressFrame(Frame):
 
         self.origin_route_id = buffer[offset:offset + 16]
         offset += 16
-        self.key_value_map, offset = parse_key_value_map(buffer, offset)
+
+        if self.flag_encrypted:
+            self.encrypted_payload = buffer[offset:]
+            return
+
+        self.key_value_map, offset = parse_key_value_map(buffer, offset, tag_table)
         self.metadata = buffer[offset:]
 
-    def serialize(self, middle=b'', flags: int = 0) -> bytes:
+    def serialize(self, middle=b'', flags: int = 0, tag_table: Optional[TagTable] = None) -> bytes:
         flags &= ~_FLAG_ENCRYPTED_BIT
 
+        if self.flag_encrypted:
+            flags |= _FLAG_ENCRYPTED_BIT
+
         if self.flag_unicast:
             flags |= _FLAG_UNICAST_BIT
 
@@ -282,8 +294,11 @@ class AddressFrame(Frame):
 
         middle += self.origin_route_id
 
-        middle += serialize_key_value(self.key_value_map)
-        middle += self.metadata
+        if self.flag_encrypted:
+            middle += self.encrypted_payload
+        else:
+            middle += serialize_key_value(self.key_value_map, tag_table)
+            middle += self.metadata
 
         return Frame.serialize(self, middle, flags)
 
@@ -297,12 +312,16 @@ _frame_class_by_id = {
 }
 
 
-def parse_or_ignore(buffer: bytes) -> Optional[Frame]:
+def parse_or_ignore(buffer: bytes, tag_table: Optional[TagTable] = None) -> Optional[Frame]:
     if len(buffer) < HEADER_LENGTH:
         raise ParseError('Frame too short: {} bytes'.format(len(buffer)))
 
     header = Header()
-    parse_header(header, buffer, 0)
+
+    try:
+        parse_header(header, buffer, 0)
+    except ValueError as exception:
+        raise RSocketUnknownFrameType(buffer[4] >> 2) from exception
 
     try:
         frame = _frame_class_by_id[header.frame_type]()
@@ -310,7 +329,11 @@ def parse_or_ignore(buffer: bytes) -> Optional[Frame]:
         raise RSocketUnknownFrameType(header.frame_type) from exception
 
     try:
-        frame.parse(buffer, 0)
+        if isinstance(frame, AddressFrame):
+            frame.parse(buffer, 0, tag_table)
+        else:
+            frame.parse(buffer, 0)
+
         return frame
     except Exception as exception:
         if not header.flags_ignore:
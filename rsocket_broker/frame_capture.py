@@ -0,0 +1,261 @@
+import argparse
+import struct
+import sys
+import time
+import tracemalloc
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from rsocket.exceptions import ParseError, RSocketProtocolError, RSocketUnknownFrameType
+
+from rsocket_broker.exceptions import RSocketBrokerException
+from rsocket_broker.frame import Frame, parse_or_ignore
+from rsocket_broker.routing_table import RoutingTable
+from rsocket_broker.tag_table import TagTable
+
+CAPTURE_MAGIC = b'RSBC'
+CAPTURE_VERSION = 2
+
+_CAPTURE_HEADER = struct.Struct('>4sB')
+_RECORD_HEADER = struct.Struct('>QII')  # Timestamp (nanoseconds) + connection id + frame length.
+
+
+class FrameCaptureWriter:
+    """
+    Records broker frames into a binary log: a header followed by one
+    (timestamp, connection id, length, frame) record per frame.
+
+    Raw inbound buffers should be recorded with write, so frames compressed with a tag table
+    can be replayed per connection. write_frame records the plain Frame.serialize encoding.
+    """
+
+    __slots__ = (
+        '_stream',
+        '_clock'
+    )
+
+    def __init__(self, stream: BinaryIO, clock: Callable[[], int] = time.monotonic_ns):
+        self._stream = stream
+        self._clock = clock
+        stream.write(_CAPTURE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION))
+
+    def write(self, buffer: bytes, connection_id: int = 0, timestamp: Optional[int] = None):
+        if timestamp is None:
+            timestamp = self._clock()
+
+        self._stream.write(_RECORD_HEADER.pack(timestamp, connection_id, len(buffer)))
+        self._stream.write(buffer)
+
+    def write_frame(self, frame: Frame, connection_id: int = 0, timestamp: Optional[int] = None):
+        self.write(frame.serialize(), connection_id, timestamp)
+
+
+def read_capture(stream: BinaryIO) -> Iterator[Tuple[int, int, bytes]]:
+    header = stream.read(_CAPTURE_HEADER.size)
+
+    if len(header) < _CAPTURE_HEADER.size:
+        raise ParseError('Capture too short')
+
+    magic, version = _CAPTURE_HEADER.unpack(header)
+
+    if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+        raise ParseError('Unsupported capture format: {} version {}'.format(magic, version))
+
+    while True:
+        record_header = stream.read(_RECORD_HEADER.size)
+
+        if not record_header:
+            return
+
+        if len(record_header) < _RECORD_HEADER.size:
+            raise ParseError('Truncated capture record header')
+
+        timestamp, connection_id, length = _RECORD_HEADER.unpack(record_header)
+        buffer = stream.read(length)
+
+        if len(buffer) < length:
+            raise ParseError('Truncated capture record: expected {} bytes, got {}'.format(length, len(buffer)))
+
+        yield timestamp, connection_id, buffer
+
+
+class ReplayStatistics:
+    __slots__ = (
+        'frame_count',
+        'byte_count',
+        'error_count',
+        'elapsed',
+        'latencies',
+        'allocated_bytes',
+        'retained_bytes',
+        'peak_frame_allocated_bytes'
+    )
+
+    def __init__(self):
+        self.frame_count = 0
+        self.byte_count = 0
+        self.error_count = 0
+        self.elapsed = 0.0
+        self.latencies: List[int] = []
+        self.allocated_bytes = None
+        self.retained_bytes = None
+        self.peak_frame_allocated_bytes = None
+
+    @property
+    def frames_per_second(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+
+        return self.frame_count / self.elapsed
+
+    def latency_percentile(self, percentile: float) -> int:
+        """Nearest rank percentile of the per frame handling latency, in nanoseconds."""
+
+        if not self.latencies:
+            return 0
+
+        ordered = sorted(self.latencies)
+        rank = max(0, min(len(ordered) - 1, int(round(percentile / 100 * len(ordered))) - 1))
+        return ordered[rank]
+
+    def summary(self) -> str:
+        lines = [
+            'frames: {}'.format(self.frame_count),
+            'errors: {}'.format(self.error_count),
+            'bytes: {}'.format(self.byte_count),
+            'elapsed: {:.3f}s'.format(self.elapsed),
+            'throughput: {:.0f} frames/s'.format(self.frames_per_second),
+            'latency p50/p90/p99/max: {}/{}/{}/{} ns'.format(
+                self.latency_percentile(50),
+                self.latency_percentile(90),
+                self.latency_percentile(99),
+                max(self.latencies, default=0)),
+        ]
+
+        if self.allocated_bytes is not None:
+            lines.append('allocated: {} bytes, retained: {} bytes, peak per frame: {} bytes'.format(
+                self.allocated_bytes, self.retained_bytes, self.peak_frame_allocated_bytes))
+
+        return '\n'.join(lines)
+
+
+def replay_capture(stream: BinaryIO,
+                   speed: Optional[float] = 1.0,
+                   frame_handler: Optional[Callable[[Frame], None]] = None,
+                   track_allocations: bool = False,
+                   tag_table_capacity: int = 0,
+                   sleep: Callable[[float], None] = time.sleep) -> ReplayStatistics:
+    """
+    Feed a capture through the frame parser (and frame_handler, if given).
+
+    Recorded inter-frame delays are divided by speed; a speed of None or 0 replays as fast as possible.
+    A positive tag_table_capacity decodes each connection's frames with its own TagTable.
+    A frame which fails to parse is counted as an error, and the rest of its connection is skipped.
+
+    Allocation tracking measures the traced memory growth of each frame's handling (requires Python 3.9+):
+    allocated_bytes sums the per frame peak, retained_bytes what was still allocated afterwards.
+    """
+
+    if track_allocations and not hasattr(tracemalloc, 'reset_peak'):
+        raise RSocketBrokerException('Allocation tracking requires Python 3.9 or later')
+
+    statistics = ReplayStatistics()
+    tag_tables: Dict[int, TagTable] = {}
+    failed_connections: Set[int] = set()
+    start_tracing = track_allocations and not tracemalloc.is_tracing()
+
+    if track_allocations:
+        statistics.allocated_bytes = 0
+        statistics.retained_bytes = 0
+        statistics.peak_frame_allocated_bytes = 0
+
+    if start_tracing:
+        tracemalloc.start()
+
+    first_timestamp = None
+    start = time.perf_counter()
+
+    try:
+        for timestamp, connection_id, buffer in read_capture(stream):
+            if connection_id in failed_connections:
+                continue
+
+            if speed:
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+
+                delay = (timestamp - first_timestamp) / 1e9 / speed - (time.perf_counter() - start)
+
+                if delay > 0:
+                    sleep(delay)
+
+            tag_table = None
+
+            if tag_table_capacity > 0:
+                tag_table = tag_tables.get(connection_id)
+
+                if tag_table is None:
+                    tag_table = tag_tables[connection_id] = TagTable(tag_table_capacity)
+
+            if track_allocations:
+                tracemalloc.reset_peak()
+                memory_before = tracemalloc.get_traced_memory()[0]
+
+            frame_start = time.perf_counter_ns()
+
+            try:
+                frame = parse_or_ignore(buffer, tag_table)
+
+                if frame is not None and frame_handler is not None:
+                    frame_handler(frame)
+            except (ParseError, RSocketProtocolError, RSocketUnknownFrameType):
+                statistics.error_count += 1
+                failed_connections.add(connection_id)
+                continue
+
+            if track_allocations:
+                memory_after, memory_peak = tracemalloc.get_traced_memory()
+                frame_allocated_bytes = memory_peak - memory_before
+                statistics.allocated_bytes += frame_allocated_bytes
+                statistics.retained_bytes += memory_after - memory_before
+                statistics.peak_frame_allocated_bytes = max(statistics.peak_frame_allocated_bytes,
+                                                            frame_allocated_bytes)
+
+            statistics.latencies.append(time.perf_counter_ns() - frame_start)
+            statistics.frame_count += 1
+            statistics.byte_count += len(buffer)
+
+        statistics.elapsed = time.perf_counter() - start
+    finally:
+        if start_tracing:
+            tracemalloc.stop()
+
+    return statistics
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Replay a broker frame capture')
+    parser.add_argument('capture', help='Capture file')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Replay speed multiplier, 0 for maximum speed (default: 1)')
+    parser.add_argument('--track-allocations', action='store_true',
+                        help='Measure memory allocations during replay (slower)')
+    parser.add_argument('--tag-table-capacity', type=int, default=0,
+                        help='Tag table capacity negotiated by the captured connections (default: 0, disabled)')
+    parser.add_argument('--codec-only', action='store_true',
+                        help='Only parse frames, without applying route frames to a routing table')
+    options = parser.parse_args(args)
+
+    frame_handler = None if options.codec_only else RoutingTable().apply
+
+    with open(options.capture, 'rb') as capture:
+        statistics = replay_capture(capture,
+                                    options.speed,
+                                    frame_handler,
+                                    track_allocations=options.track_allocations,
+                                    tag_table_capacity=options.tag_table_capacity)
+
+    print(statistics.summary())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,23 +1,41 @@
-from typing import Dict, Tuple
+from typing import Dict, Tuple, Optional
 
 from rsocket.frame_helpers import parse_type, serialize_128max_value
 from rsocket.helpers import serialize_well_known_encoding
 
-from rsocket_broker.well_known_keys import WellKnownKeys
+from rsocket_broker.exceptions import RSocketBrokerException
+from rsocket_broker.tag_table import TagTable, DYNAMIC_TAG_INDEX_OFFSET
+from rsocket_broker.well_known_keys import WellKnownKeys, WellKnownKey
 
+MAX_TAG_LENGTH = 128
 
-def parse_key_value_map(buffer: bytes, offset: int) -> Tuple[Dict[bytes, bytes], int]:
+
+def parse_key_value_map(buffer: bytes,
+                        offset: int,
+                        tag_table: Optional[TagTable] = None) -> Tuple[Dict[bytes, bytes], int]:
     key_value_map = {}
 
     while offset < len(buffer):
-        is_known_type, tag_length = parse_type(buffer[offset:])
+        is_known_type, tag_id_or_length = parse_type(buffer[offset:])
         offset += 1
-        tag_length = tag_length + 1
+
+        if is_known_type and tag_table is not None and tag_id_or_length >= DYNAMIC_TAG_INDEX_OFFSET:
+            tag, value = tag_table.require_by_index(tag_id_or_length - DYNAMIC_TAG_INDEX_OFFSET)
+            has_next_value, _ = parse_type(buffer[offset:])
+            offset += 1
+            key_value_map[tag] = value
+
+            if not has_next_value:
+                break
+
+            continue
+
         if not is_known_type:
+            tag_length = tag_id_or_length + 1
             tag = buffer[offset:offset + tag_length]
             offset += tag_length
         else:
-            tag = WellKnownKeys.require_by_id(tag_length).name
+            tag = WellKnownKeys.require_by_id(tag_id_or_length).name
 
         has_next_value, value_length = parse_type(buffer[offset:])
         offset += 1
@@ -30,27 +48,72 @@ def parse_key_value_map(buffer: bytes, offset: int) -> Tuple[Dict[bytes, bytes],
 
         key_value_map[tag] = value
 
+        if tag_table is not None:
+            tag_table.insert(tag, value)
+
         if not has_next_value:
             break
 
     return key_value_map, offset
 
 
-def serialize_key_value(key_value_map) -> bytes:
-    key_value_count = len(key_value_map)
-    middle = b''
-    for index, (key, value) in enumerate(key_value_map.items()):
-        middle += serialize_well_known_encoding(key, WellKnownKeys.get_by_name)
+def serialize_key_value(key_value_map, tag_table: Optional[TagTable] = None) -> bytes:
+    tags = [(_ensure_key_name(key), value) for key, value in key_value_map.items()]
 
-        if value is not None:
-            value_bytes = serialize_128max_value(value)
-        else:
-            value_bytes = bytearray(1)
+    for key, value in tags:
+        if not 0 < len(value or b'') <= MAX_TAG_LENGTH:
+            raise RSocketBrokerException('Tag value length must be between 1 and {}: {}'.format(
+                MAX_TAG_LENGTH, key))
+
+        if _get_well_known_key_id(key) is None and not 0 < len(key) <= MAX_TAG_LENGTH:
+            raise RSocketBrokerException('Tag key length must be between 1 and {}: {}'.format(
+                MAX_TAG_LENGTH, key[:MAX_TAG_LENGTH]))
 
+    key_value_count = len(tags)
+    middle = b''
+    for index, (key, value) in enumerate(tags):
         has_next_tag = index != key_value_count - 1
 
+        table_index = tag_table.get_index(key, value) if tag_table is not None else None
+
+        if table_index is not None:
+            middle += _serialize_type(True, DYNAMIC_TAG_INDEX_OFFSET + table_index)
+            middle += _serialize_type(has_next_tag, 0)
+            continue
+
+        middle += serialize_well_known_encoding(key, _get_well_known_key_id)
+
+        value_bytes = bytearray(serialize_128max_value(value))
+
         if has_next_tag:
-            value_bytes[0] = value_bytes[0] & (0xff >> 1)
+            value_bytes[0] = value_bytes[0] | (1 << 7)
 
         middle += value_bytes
+
+        if tag_table is not None:
+            tag_table.insert(key, value)
+
     return middle
+
+
+def _ensure_key_name(key) -> bytes:
+    if isinstance(key, WellKnownKeys):
+        return key.value.name
+
+    if isinstance(key, WellKnownKey):
+        return key.name
+
+    return key
+
+
+def _get_well_known_key_id(key_name: bytes) -> Optional[int]:
+    well_known_key = WellKnownKeys.get_by_name(key_name)
+
+    if well_known_key is None:
+        return None
+
+    return well_known_key.id
+
+
+def _serialize_type(flag: bool, id_or_length: int) -> bytes:
+    return ((int(flag) << 7) | id_or_length & 0b1111111).to_bytes(1, 'big')
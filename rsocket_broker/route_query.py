@@ -0,0 +1,191 @@
+import asyncio
+import struct
+from enum import IntEnum, unique
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+
+from reactivestreams.publisher import Publisher
+from rsocket.exceptions import ParseError
+from rsocket.frame_helpers import pack_24bit_length, unpack_24bit
+from rsocket.payload import Payload
+from rsocket.streams.stream_from_async_generator import StreamFromAsyncGenerator
+
+from rsocket_broker.exceptions import RSocketBrokerException
+from rsocket_broker.frame import Frame, RouteAddFrame, RouteRemoveFrame, parse_or_ignore
+from rsocket_broker.frame_helpers import parse_key_value_map, serialize_key_value
+from rsocket_broker.routing_table import RoutingTable, route_matches
+
+DEFAULT_PAGE_SIZE = 256
+MAX_PAGE_SIZE = 0xFFFF
+DEFAULT_MAX_PENDING_DELTAS = 10000
+
+_FLAG_WATCH_BIT = 0x01
+
+_QUERY_HEADER = struct.Struct('>BH')  # Flags + page size.
+
+
+@unique
+class RoutePageType(IntEnum):
+    SNAPSHOT = 1
+    SNAPSHOT_COMPLETE = 2
+    DELTA = 3
+
+
+class RouteQuery:
+    """
+    Request for the route table stream: routes matching all of the given tags, sent in pages of
+    up to page_size RouteAddFrames. In watch mode the snapshot is followed by pages of subsequent
+    RouteAddFrame/RouteRemoveFrame deltas for matching routes.
+    """
+
+    __slots__ = (
+        'tags',
+        'watch',
+        'page_size'
+    )
+
+    def __init__(self,
+                 tags: Optional[Dict[bytes, bytes]] = None,
+                 watch: bool = False,
+                 page_size: int = DEFAULT_PAGE_SIZE):
+        if not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise RSocketBrokerException('Route query page size must be between 1 and {}: {}'.format(
+                MAX_PAGE_SIZE, page_size))
+
+        self.tags = tags or {}
+        self.watch = watch
+        self.page_size = page_size
+
+    def parse(self, buffer: bytes, offset: int):
+        if len(buffer) - offset < _QUERY_HEADER.size:
+            raise ParseError('Route query too short: {} bytes'.format(len(buffer) - offset))
+
+        flags, self.page_size = _QUERY_HEADER.unpack_from(buffer, offset)
+        offset += _QUERY_HEADER.size
+
+        if self.page_size == 0:
+            raise ParseError('Route query page size must be positive')
+
+        self.watch = (flags & _FLAG_WATCH_BIT) != 0
+        self.tags, _ = parse_key_value_map(buffer, offset)
+
+    def serialize(self) -> bytes:
+        flags = _FLAG_WATCH_BIT if self.watch else 0
+
+        return _QUERY_HEADER.pack(flags, self.page_size) + serialize_key_value(self.tags)
+
+
+def serialize_route_page(page_type: RoutePageType, frames: List[Frame]) -> Payload:
+    chunks = []
+
+    for frame in frames:
+        frame_data = frame.serialize()
+        chunks.append(pack_24bit_length(frame_data))
+        chunks.append(frame_data)
+
+    return Payload(b''.join(chunks), bytes([page_type]))
+
+
+def parse_route_page(payload: Payload) -> Tuple[RoutePageType, List[Frame]]:
+    page_type = RoutePageType(payload.metadata[0])
+    frames = []
+    data = payload.data or b''
+    offset = 0
+
+    while offset < len(data):
+        length = unpack_24bit(data, offset)
+        offset += 3
+        frame = parse_or_ignore(data[offset:offset + length])
+        offset += length
+
+        if frame is not None:
+            frames.append(frame)
+
+    return page_type, frames
+
+
+def stream_routes(routing_table: RoutingTable,
+                  payload: Payload,
+                  max_pending_deltas: int = DEFAULT_MAX_PENDING_DELTAS) -> Publisher:
+    """
+    Request-stream handler for the route table. Pages are only generated as they are requested.
+
+    Deltas arriving while the snapshot is being paged out are buffered without limit. Once the
+    snapshot is complete, a watching subscriber which falls more than max_pending_deltas behind
+    that backlog gets a stream error, and is expected to query a new snapshot.
+    """
+
+    query = RouteQuery()
+    query.parse(payload.data or b'', 0)
+
+    return StreamFromAsyncGenerator(lambda: _route_pages(routing_table, query, max_pending_deltas))
+
+
+class _RouteWatcher:
+    __slots__ = (
+        'tags',
+        'deltas',
+        'max_pending_deltas',
+        'pending_limit',
+        'overflowed'
+    )
+
+    def __init__(self, tags: Dict[bytes, bytes], max_pending_deltas: int):
+        self.tags = tags
+        self.deltas = asyncio.Queue()
+        self.max_pending_deltas = max_pending_deltas
+        self.pending_limit = None
+        self.overflowed = False
+
+    def snapshot_complete(self):
+        self.pending_limit = self.deltas.qsize() + self.max_pending_deltas
+
+    def __call__(self, route: RouteAddFrame, remove_frame: Optional[RouteRemoveFrame]):
+        if self.overflowed or not route_matches(route, self.tags):
+            return
+
+        if self.pending_limit is not None and self.deltas.qsize() >= self.pending_limit:
+            self.overflowed = True
+            return
+
+        self.deltas.put_nowait(route if remove_frame is None else remove_frame)
+
+
+async def _route_pages(routing_table: RoutingTable,
+                       query: RouteQuery,
+                       max_pending_deltas: int) -> AsyncGenerator[Tuple[Payload, bool], None]:
+    watcher = None
+
+    if query.watch:
+        watcher = _RouteWatcher(query.tags, max_pending_deltas)
+        routing_table.add_listener(watcher)
+
+    try:
+        routes = list(routing_table.find(query.tags))
+        page_size = query.page_size
+        last_page_start = max(0, (len(routes) - 1) // page_size * page_size)
+
+        for start in range(0, last_page_start, page_size):
+            yield serialize_route_page(RoutePageType.SNAPSHOT, routes[start:start + page_size]), False
+
+        if watcher is not None:
+            watcher.snapshot_complete()
+
+        yield serialize_route_page(RoutePageType.SNAPSHOT_COMPLETE, routes[last_page_start:]), watcher is None
+
+        if watcher is None:
+            return
+
+        while True:
+            frames = [await watcher.deltas.get()]
+
+            while len(frames) < page_size and not watcher.deltas.empty():
+                frames.append(watcher.deltas.get_nowait())
+
+            if watcher.overflowed:
+                raise RSocketBrokerException('Route watch fell behind by more than {} deltas'.format(
+                    max_pending_deltas))
+
+            yield serialize_route_page(RoutePageType.DELTA, frames), False
+    finally:
+        if watcher is not None:
+            routing_table.remove_listener(watcher)
@@ -0,0 +1,131 @@
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from rsocket_broker.frame import Frame, RouteAddFrame, RouteRemoveFrame
+from rsocket_broker.well_known_keys import WellKnownKeys
+
+RouteListener = Callable[[RouteAddFrame, Optional[RouteRemoveFrame]], None]
+
+
+class RoutingTable:
+    """
+    In memory route table, indexed by tag (the service name is indexed under the ServiceName well known key).
+
+    Listeners are notified with (route, None) when a route is added, and with (route, remove_frame)
+    when it is removed. Replacing an existing route notifies a removal followed by an addition.
+    """
+
+    __slots__ = (
+        '_routes',
+        '_route_ids_by_tag',
+        '_listeners'
+    )
+
+    def __init__(self):
+        self._routes: Dict[bytes, RouteAddFrame] = {}
+        self._route_ids_by_tag: Dict[Tuple[bytes, bytes], Set[bytes]] = {}
+        self._listeners: List[RouteListener] = []
+
+    def __len__(self):
+        return len(self._routes)
+
+    def __contains__(self, route_id: bytes):
+        return route_id in self._routes
+
+    def get(self, route_id: bytes) -> Optional[RouteAddFrame]:
+        return self._routes.get(route_id)
+
+    def add(self, frame: RouteAddFrame):
+        previous = self._routes.get(frame.route_id)
+
+        if previous is not None:
+            self._unindex(previous)
+            self._notify(previous, _create_remove_frame(previous))
+
+        self._routes[frame.route_id] = frame
+
+        for tag in _route_tags(frame):
+            self._route_ids_by_tag.setdefault(tag, set()).add(frame.route_id)
+
+        self._notify(frame, None)
+
+    def remove(self, frame: RouteRemoveFrame) -> Optional[RouteAddFrame]:
+        route = self._routes.pop(frame.route_id, None)
+
+        if route is not None:
+            self._unindex(route)
+            self._notify(route, frame)
+
+        return route
+
+    def apply(self, frame: Frame):
+        if isinstance(frame, RouteAddFrame):
+            self.add(frame)
+        elif isinstance(frame, RouteRemoveFrame):
+            self.remove(frame)
+
+    def find(self, tags: Optional[Dict[bytes, bytes]] = None) -> Iterator[RouteAddFrame]:
+        if not tags:
+            yield from self._routes.values()
+            return
+
+        candidates = []
+
+        for tag in tags.items():
+            route_ids = self._route_ids_by_tag.get(tag)
+
+            if not route_ids:
+                return
+
+            candidates.append(route_ids)
+
+        candidates.sort(key=len)
+        smallest, others = candidates[0], candidates[1:]
+
+        for route_id in smallest:
+            if all(route_id in route_ids for route_ids in others):
+                yield self._routes[route_id]
+
+    def add_listener(self, listener: RouteListener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: RouteListener):
+        self._listeners.remove(listener)
+
+    def _unindex(self, route: RouteAddFrame):
+        for tag in _route_tags(route):
+            route_ids = self._route_ids_by_tag.get(tag)
+
+            if route_ids is not None:
+                route_ids.discard(route.route_id)
+
+                if not route_ids:
+                    del self._route_ids_by_tag[tag]
+
+    def _notify(self, route: RouteAddFrame, remove_frame: Optional[RouteRemoveFrame]):
+        for listener in list(self._listeners):
+            listener(route, remove_frame)
+
+
+def route_matches(route: RouteAddFrame, tags: Optional[Dict[bytes, bytes]]) -> bool:
+    if not tags:
+        return True
+
+    route_tags = set(_route_tags(route))
+    return all(tag in route_tags for tag in tags.items())
+
+
+def _create_remove_frame(route: RouteAddFrame) -> RouteRemoveFrame:
+    frame = RouteRemoveFrame()
+    frame.broker_id = route.broker_id
+    frame.route_id = route.route_id
+    frame.timestamp = route.timestamp
+    return frame
+
+
+def _route_tags(route: RouteAddFrame) -> Iterator[Tuple[bytes, bytes]]:
+    if route.service_name is not None:
+        yield WellKnownKeys.TAG_ServiceName.value.name, bytes(route.service_name)
+
+    for key, value in route.key_value_map.items():
+        if value is not None:
+            yield bytes(key), bytes(value)
@@ -0,0 +1,85 @@
+from typing import Dict, Optional, Tuple, List
+
+from rsocket_broker.exceptions import RSocketBrokerException, RSocketBrokerUnknownTagIndex
+
+DYNAMIC_TAG_INDEX_OFFSET = 0x20  # Key ids below this are reserved for well known keys.
+MAX_TAG_TABLE_CAPACITY = 0x80 - DYNAMIC_TAG_INDEX_OFFSET
+
+TAG_TABLE_CAPACITY_KEY = b'io.rsocket.broker.TagTableCapacity'
+
+
+class TagTable:
+    """
+    Connection scoped dictionary of tag key/value pairs (similar in spirit to the HPACK dynamic table).
+
+    Every literal tag serialized (or parsed) with a table is inserted into it, so a repeated tag
+    is sent as a single index byte instead of the full key and value. Each direction of a connection
+    requires its own table, and both peers must apply the same sequence of frames to stay in sync.
+    Once full, the oldest entry is evicted.
+
+    A frame which fails to parse may leave the table partially updated, in which case the table
+    is out of sync with the peer and the connection must be closed.
+    """
+
+    __slots__ = (
+        'capacity',
+        '_entries',
+        '_index_by_entry',
+        '_next_index'
+    )
+
+    def __init__(self, capacity: int = MAX_TAG_TABLE_CAPACITY):
+        if not 0 <= capacity <= MAX_TAG_TABLE_CAPACITY:
+            raise RSocketBrokerException('Tag table capacity must be between 0 and {}: {}'.format(
+                MAX_TAG_TABLE_CAPACITY, capacity))
+
+        self.capacity = capacity
+        self._entries: List[Optional[Tuple[bytes, bytes]]] = [None] * capacity
+        self._index_by_entry: Dict[Tuple[bytes, bytes], int] = {}
+        self._next_index = 0
+
+    def __len__(self):
+        return len(self._index_by_entry)
+
+    def get_index(self, key: bytes, value: bytes) -> Optional[int]:
+        return self._index_by_entry.get((bytes(key), bytes(value)))
+
+    def require_by_index(self, index: int) -> Tuple[bytes, bytes]:
+        entry = self._entries[index] if index < self.capacity else None
+
+        if entry is None:
+            raise RSocketBrokerUnknownTagIndex(index)
+
+        return entry
+
+    def insert(self, key: bytes, value: bytes):
+        if self.capacity == 0:
+            return
+
+        entry = (bytes(key), bytes(value))
+        index = self._next_index
+        evicted = self._entries[index]
+
+        if evicted is not None and self._index_by_entry.get(evicted) == index:
+            del self._index_by_entry[evicted]
+
+        self._entries[index] = entry
+        self._index_by_entry[entry] = index
+        self._next_index = (index + 1) % self.capacity
+
+
+def negotiate_tag_table_capacity(local_capacity: int, key_value_map: Dict[bytes, bytes]) -> int:
+    """
+    Agreed table capacity given the local limit and the tags advertised by the peer
+    (see TAG_TABLE_CAPACITY_KEY). Zero means tag compression is disabled.
+    """
+
+    remote_capacity = key_value_map.get(TAG_TABLE_CAPACITY_KEY)
+
+    try:
+        remote_capacity = int(remote_capacity)
+    except (TypeError, ValueError):
+        return 0
+
+    return max(0, min(local_capacity, remote_capacity, MAX_TAG_TABLE_CAPACITY))
+
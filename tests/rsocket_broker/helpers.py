@@ -1,4 +1,8 @@
 from math import ceil
+from typing import Dict, Optional
+
+from rsocket_broker.address_encryption import AddressCipher
+from rsocket_broker.frame import AddressFrame, RouteAddFrame, RouteRemoveFrame
 
 
 def data_bits(data: bytes, name: str = None):
@@ -19,3 +23,49 @@ def bitstring_to_bytes(s: str) -> bytes:
 
 def bits(bit_count, value, comment) -> str:
     return f'{value:b}'.zfill(bit_count)
+
+
+class XorAddressCipher(AddressCipher):
+    def __init__(self, key: bytes = b'secret'):
+        self._key = key
+
+    def encrypt(self, plaintext: bytes) -> bytes:
+        return bytes(byte ^ self._key[index % len(self._key)] for index, byte in enumerate(plaintext))
+
+    def decrypt(self, ciphertext: bytes) -> bytes:
+        if not ciphertext:
+            raise ValueError('Empty ciphertext')
+
+        return self.encrypt(ciphertext)
+
+
+def create_address_frame(key_value_map: Optional[Dict[bytes, bytes]] = None,
+                         metadata: bytes = b'wrapped_metadata') -> AddressFrame:
+    frame = AddressFrame()
+    frame.origin_route_id = b'1234567890123456'
+    frame.flag_unicast = True
+    frame.key_value_map = key_value_map if key_value_map is not None else {b'abcdefgh': b'01234567'}
+    frame.metadata = metadata
+    return frame
+
+
+def create_route(route_id: bytes, service_name: bytes = b'service', **tags) -> RouteAddFrame:
+    frame = RouteAddFrame()
+    frame.broker_id = b'broker'.ljust(16, b'-')
+    frame.route_id = route_id.ljust(16, b'-')
+    frame.timestamp = 123
+    frame.service_name = service_name
+    frame.key_value_map = {key.encode(): value.encode() for key, value in tags.items()}
+    return frame
+
+
+def remove_route(route_id: bytes) -> RouteRemoveFrame:
+    frame = RouteRemoveFrame()
+    frame.broker_id = b'broker'.ljust(16, b'-')
+    frame.route_id = route_id.ljust(16, b'-')
+    frame.timestamp = 124
+    return frame
+
+
+def route_ids(routes):
+    return {route.route_id.rstrip(b'-') for route in routes}
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import cast
+
+import pytest
+
+from rsocket_broker import address_encryption
+from rsocket_broker.address_encryption import AddressFrameCipherExecutor
+from rsocket_broker.exceptions import RSocketBrokerException
+from rsocket_broker.frame import AddressFrame, parse_or_ignore
+from tests.rsocket_broker.helpers import data_bits, build_frame, bits, XorAddressCipher, create_address_frame
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.submissions = 0
+
+    def submit(self, *args, **kwargs):
+        self.submissions += 1
+        return super().submit(*args, **kwargs)
+
+
+def test_encrypted_address_frame():
+    items = [
+        bits(16, 0, 'Major version'),
+        bits(16, 1, 'Minor version'),
+        bits(6, 5, 'Frame type'),
+        bits(1, 0, 'Padding flags'),
+        bits(1, 1, 'Encrypted flags'),
+        bits(1, 1, 'Unicast flags'),
+        bits(1, 0, 'Multicast flags'),
+        bits(1, 0, 'Share route flags'),
+        bits(5, 0, 'Padding flags'),
+        data_bits(b'1234567890123456', 'OriginRouteId'),
+        data_bits(b'encrypted_tags_and_metadata')
+    ]
+
+    frame_data = build_frame(*items)
+    frame = cast(AddressFrame, parse_or_ignore(frame_data))
+
+    assert frame.flag_encrypted
+    assert frame.flag_unicast
+    assert frame.origin_route_id == b'1234567890123456'
+    assert frame.key_value_map == {}
+    assert frame.metadata == b''
+    assert frame.encrypted_payload == b'encrypted_tags_and_metadata'
+
+    assert frame.serialize() == frame_data
+
+
+async def test_encrypt_decrypt_address_frame():
+    cipher_executor = AddressFrameCipherExecutor(XorAddressCipher())
+
+    frame = await cipher_executor.encrypt(create_address_frame())
+    frame_data = frame.serialize()
+
+    assert frame.flag_encrypted
+    assert b'abcdefgh' not in frame_data
+    assert b'wrapped_metadata' not in frame_data
+
+    parsed = await cipher_executor.decrypt(cast(AddressFrame, parse_or_ignore(frame_data)))
+
+    assert not parsed.flag_encrypted
+    assert parsed.flag_unicast
+    assert parsed.key_value_map == {b'abcdefgh': b'01234567'}
+    assert parsed.metadata == b'wrapped_metadata'
+    assert parsed.serialize() == create_address_frame().serialize()
+
+
+async def test_small_payloads_are_batched():
+    with CountingExecutor() as executor:
+        cipher_executor = AddressFrameCipherExecutor(XorAddressCipher(), executor, max_batch_size=4)
+
+        frames = await asyncio.gather(*[cipher_executor.encrypt(create_address_frame()) for _ in range(10)])
+
+        assert all(frame.flag_encrypted for frame in frames)
+        assert executor.submissions == 3
+
+
+async def test_large_payloads_are_submitted_individually():
+    with CountingExecutor() as executor:
+        cipher_executor = AddressFrameCipherExecutor(XorAddressCipher(), executor, max_batch_bytes=80)
+
+        await asyncio.gather(
+            cipher_executor.encrypt(create_address_frame(metadata=b'x' * 100)),
+            cipher_executor.encrypt(create_address_frame(metadata=b'x' * 100)),
+            cipher_executor.encrypt(create_address_frame()),
+            cipher_executor.encrypt(create_address_frame()),
+        )
+
+        assert executor.submissions == 3
+
+
+async def test_batches_are_bounded_by_total_bytes():
+    with CountingExecutor() as executor:
+        cipher_executor = AddressFrameCipherExecutor(XorAddressCipher(), executor, max_batch_bytes=100)
+
+        await asyncio.gather(*[cipher_executor.encrypt(create_address_frame()) for _ in range(6)])
+
+        assert executor.submissions == 3
+
+
+async def test_frames_are_not_mutated():
+    cipher_executor = AddressFrameCipherExecutor(XorAddressCipher())
+    frame = create_address_frame()
+
+    encrypted = await cipher_executor.encrypt(frame)
+
+    assert encrypted is not frame
+    assert frame.serialize() == create_address_frame().serialize()
+
+    encrypted_data = encrypted.serialize()
+    decrypted = await cipher_executor.decrypt(encrypted)
+
+    assert decrypted is not encrypted
+    assert encrypted.serialize() == encrypted_data
+    assert decrypted.serialize() == frame.serialize()
+
+
+async def test_tag_block_is_handled_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def record_thread(function):
+        def wrapper(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return function(*args, **kwargs)
+
+        return wrapper
+
+    monkeypatch.setattr(address_encryption, 'serialize_key_value',
+                        record_thread(address_encryption.serialize_key_value))
+    monkeypatch.setattr(address_encryption, 'parse_key_value_map',
+                        record_thread(address_encryption.parse_key_value_map))
+
+    cipher_executor = AddressFrameCipherExecutor(XorAddressCipher())
+    frame = await cipher_executor.decrypt(await cipher_executor.encrypt(create_address_frame()))
+
+    assert frame.key_value_map == {b'abcdefgh': b'01234567'}
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
+
+
+@pytest.mark.parametrize('max_batch_size, max_batch_bytes', ((0, 4096), (64, 0), (-1, -1)))
+def test_invalid_batch_limits(max_batch_size, max_batch_bytes):
+    with pytest.raises(RSocketBrokerException):
+        AddressFrameCipherExecutor(XorAddressCipher(), max_batch_size=max_batch_size, max_batch_bytes=max_batch_bytes)
+
+
+async def test_cipher_error_fails_only_its_frame():
+    cipher_executor = AddressFrameCipherExecutor(XorAddressCipher())
+    encrypted = await cipher_executor.encrypt(create_address_frame())
+    empty = AddressFrame()
+    empty.flag_encrypted = True
+
+    results = await asyncio.gather(cipher_executor.decrypt(empty),
+                                   cipher_executor.decrypt(encrypted),
+                                   return_exceptions=True)
+
+    assert isinstance(results[0], ValueError)
+    assert results[1].metadata == b'wrapped_metadata'
+
+
+async def test_process_pool_executor():
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        cipher_executor = AddressFrameCipherExecutor(XorAddressCipher(), executor)
+
+        frame = await cipher_executor.decrypt(await cipher_executor.encrypt(create_address_frame()))
+
+        assert frame.key_value_map == {b'abcdefgh': b'01234567'}
@@ -0,0 +1,162 @@
+import io
+import tracemalloc
+
+import pytest
+from rsocket.exceptions import ParseError
+
+from rsocket_broker.frame import AddressFrame, RouteRemoveFrame, RouteAddFrame
+from rsocket_broker.frame_capture import FrameCaptureWriter, read_capture, replay_capture, main
+from rsocket_broker.routing_table import RoutingTable
+from rsocket_broker.tag_table import TagTable
+from tests.rsocket_broker.helpers import create_address_frame, create_route, remove_route
+
+
+def create_capture(*frames_by_timestamp) -> io.BytesIO:
+    stream = io.BytesIO()
+    writer = FrameCaptureWriter(stream)
+
+    for timestamp, frame in frames_by_timestamp:
+        writer.write_frame(frame, timestamp=timestamp)
+
+    stream.seek(0)
+    return stream
+
+
+def create_route_remove_frame() -> RouteRemoveFrame:
+    frame = RouteRemoveFrame()
+    frame.broker_id = b'1234567890123456'
+    frame.route_id = b'6543210987654321'
+    frame.timestamp = 123
+    return frame
+
+
+def test_read_capture():
+    address_frame = create_address_frame()
+    route_remove_frame = create_route_remove_frame()
+
+    records = list(read_capture(create_capture((10, address_frame), (20, route_remove_frame))))
+
+    assert records == [(10, 0, address_frame.serialize()), (20, 0, route_remove_frame.serialize())]
+
+
+def test_read_capture_truncated():
+    capture = create_capture((10, create_address_frame()))
+    truncated = io.BytesIO(capture.getvalue()[:-1])
+
+    with pytest.raises(ParseError):
+        list(read_capture(truncated))
+
+
+def test_read_capture_invalid_header():
+    with pytest.raises(ParseError):
+        list(read_capture(io.BytesIO(b'not a capture')))
+
+
+def test_replay_capture_max_speed():
+    received = []
+    capture = create_capture((0, create_address_frame()), (10 ** 9, create_route_remove_frame()))
+
+    statistics = replay_capture(capture, speed=None, frame_handler=received.append, track_allocations=True,
+                                sleep=pytest.fail)
+
+    assert [type(frame) for frame in received] == [AddressFrame, RouteRemoveFrame]
+    assert received[0].key_value_map == {b'abcdefgh': b'01234567'}
+    assert statistics.frame_count == 2
+    assert statistics.byte_count == len(capture.getvalue()) - 5 - 2 * 16
+    assert statistics.error_count == 0
+    assert len(statistics.latencies) == 2
+    assert statistics.latency_percentile(50) <= statistics.latency_percentile(99)
+    assert 'frames: 2' in statistics.summary()
+
+
+def test_replay_capture_allocations():
+    def allocated_bytes(frame_count: int) -> int:
+        capture = create_capture(*[(0, create_address_frame()) for _ in range(frame_count)])
+        return replay_capture(capture, speed=None, track_allocations=True).allocated_bytes
+
+    assert allocated_bytes(1) > 0
+    assert allocated_bytes(200) == pytest.approx(2 * allocated_bytes(100), rel=0.2)
+    assert not tracemalloc.is_tracing()
+
+
+def test_replay_capture_keeps_existing_tracing():
+    tracemalloc.start()
+
+    try:
+        replay_capture(create_capture((0, create_address_frame())), speed=None, track_allocations=True)
+
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_replay_compressed_capture():
+    stream = io.BytesIO()
+    writer = FrameCaptureWriter(stream)
+    encoder_tables = {1: TagTable(), 2: TagTable()}
+
+    for _ in range(3):
+        for connection_id, tag_table in encoder_tables.items():
+            writer.write(create_address_frame().serialize(tag_table=tag_table), connection_id, 0)
+
+    received = []
+    stream.seek(0)
+    statistics = replay_capture(stream, speed=None, frame_handler=received.append, tag_table_capacity=96)
+
+    assert statistics.error_count == 0
+    assert statistics.frame_count == 6
+    assert all(frame.key_value_map == {b'abcdefgh': b'01234567'} for frame in received)
+
+    stream.seek(0)
+    statistics = replay_capture(stream, speed=None)
+
+    assert statistics.error_count == 2
+    assert statistics.frame_count == 2
+
+
+def test_replay_capture_paced():
+    delays = []
+    capture = create_capture((0, create_address_frame()), (10 ** 9, create_address_frame()))
+
+    replay_capture(capture, speed=4, sleep=delays.append)
+
+    assert len(delays) == 1
+    assert delays[0] == pytest.approx(0.25, abs=0.05)
+
+
+def test_replay_malformed_record():
+    stream = io.BytesIO()
+    writer = FrameCaptureWriter(stream)
+    writer.write(b'\x00\x00\x00\x01\xfc\x00', 1, 0)
+    writer.write_frame(create_address_frame(), 1, 0)
+    writer.write_frame(create_address_frame(), 2, 0)
+    stream.seek(0)
+
+    statistics = replay_capture(stream, speed=None)
+
+    assert statistics.error_count == 1
+    assert statistics.frame_count == 1
+
+
+def test_main_applies_routes(tmp_path, capsys, monkeypatch):
+    route = create_route(b'a', region='us')
+    capture_path = tmp_path / 'capture.bin'
+
+    with open(capture_path, 'wb') as capture:
+        writer = FrameCaptureWriter(capture)
+        writer.write_frame(route, timestamp=0)
+        writer.write_frame(remove_route(b'a'), timestamp=0)
+
+    applied = []
+    original_apply = RoutingTable.apply
+
+    def apply(routing_table, frame):
+        applied.append(type(frame))
+        original_apply(routing_table, frame)
+
+    monkeypatch.setattr(RoutingTable, 'apply', apply)
+
+    main([str(capture_path), '--speed', '0'])
+
+    assert applied == [RouteAddFrame, RouteRemoveFrame]
+    assert 'frames: 2' in capsys.readouterr().out
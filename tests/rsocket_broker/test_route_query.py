@@ -0,0 +1,179 @@
+import asyncio
+
+import pytest
+from reactivestreams.subscriber import DefaultSubscriber
+from rsocket.payload import Payload
+
+from rsocket_broker.exceptions import RSocketBrokerException
+from rsocket_broker.route_query import RouteQuery, RoutePageType, stream_routes, parse_route_page
+from rsocket_broker.routing_table import RoutingTable
+from tests.rsocket_broker.helpers import create_route, remove_route, route_ids
+
+
+class PageSubscriber(DefaultSubscriber):
+    def __init__(self):
+        super().__init__()
+        self.pages = asyncio.Queue()
+        self.completed = False
+        self.error = None
+
+    def on_next(self, value, is_complete=False):
+        self.pages.put_nowait(parse_route_page(value))
+        self.completed = is_complete
+
+    def on_error(self, exception: Exception):
+        self.error = exception
+
+    async def next_page(self):
+        return await asyncio.wait_for(self.pages.get(), 1)
+
+
+def create_table(count: int) -> RoutingTable:
+    table = RoutingTable()
+
+    for index in range(count):
+        table.add(create_route(str(index).encode(), region='us' if index % 2 == 0 else 'eu'))
+
+    return table
+
+
+def subscribe(table: RoutingTable, query: RouteQuery, **kwargs) -> PageSubscriber:
+    subscriber = PageSubscriber()
+    stream_routes(table, Payload(query.serialize()), **kwargs).subscribe(subscriber)
+    return subscriber
+
+
+def test_route_query_serialize():
+    query = RouteQuery({b'region': b'us'}, watch=True, page_size=10)
+
+    parsed = RouteQuery()
+    parsed.parse(query.serialize(), 0)
+
+    assert parsed.tags == {b'region': b'us'}
+    assert parsed.watch
+    assert parsed.page_size == 10
+
+
+@pytest.mark.parametrize('page_size', (0, 0x10000))
+def test_route_query_invalid_page_size(page_size):
+    with pytest.raises(RSocketBrokerException):
+        RouteQuery(page_size=page_size)
+
+
+async def test_snapshot_pages_with_filter():
+    subscriber = subscribe(create_table(10), RouteQuery({b'region': b'us'}, page_size=2))
+    subscriber.subscription.request(10)
+
+    pages = [await subscriber.next_page() for _ in range(3)]
+
+    assert [page_type for page_type, _ in pages] == [RoutePageType.SNAPSHOT,
+                                                     RoutePageType.SNAPSHOT,
+                                                     RoutePageType.SNAPSHOT_COMPLETE]
+    assert [len(frames) for _, frames in pages] == [2, 2, 1]
+    assert route_ids(frame for _, frames in pages for frame in frames) == {b'0', b'2', b'4', b'6', b'8'}
+    assert subscriber.completed
+
+
+async def test_empty_snapshot():
+    subscriber = subscribe(RoutingTable(), RouteQuery())
+    subscriber.subscription.request(1)
+
+    assert await subscriber.next_page() == (RoutePageType.SNAPSHOT_COMPLETE, [])
+    assert subscriber.completed
+
+
+async def test_snapshot_respects_backpressure():
+    subscriber = subscribe(create_table(10), RouteQuery(page_size=2))
+    subscriber.subscription.request(2)
+
+    await subscriber.next_page()
+    await subscriber.next_page()
+    await asyncio.sleep(0.05)
+
+    assert subscriber.pages.empty()
+    assert not subscriber.completed
+
+    subscriber.subscription.cancel()
+
+
+async def test_watch_maintains_replica():
+    table = create_table(4)
+    subscriber = subscribe(table, RouteQuery({b'region': b'us'}, watch=True, page_size=10))
+    subscriber.subscription.request(10)
+
+    replica = RoutingTable()
+    page_type, frames = await subscriber.next_page()
+
+    assert page_type is RoutePageType.SNAPSHOT_COMPLETE
+    assert not subscriber.completed
+
+    for frame in frames:
+        replica.apply(frame)
+
+    table.add(create_route(b'10', region='us'))
+    table.add(create_route(b'11', region='eu'))
+    table.remove(remove_route(b'0'))
+
+    page_type, frames = await subscriber.next_page()
+
+    assert page_type is RoutePageType.DELTA
+
+    for frame in frames:
+        replica.apply(frame)
+
+    assert route_ids(replica.find()) == route_ids(table.find({b'region': b'us'})) == {b'2', b'10'}
+
+    subscriber.subscription.cancel()
+    await asyncio.sleep(0.01)
+
+    table.add(create_route(b'12', region='us'))
+    subscriber.subscription.request(10)
+    await asyncio.sleep(0.05)
+
+    assert subscriber.pages.empty()
+
+
+async def test_watch_overflow():
+    table = create_table(1)
+    subscriber = subscribe(table, RouteQuery(watch=True), max_pending_deltas=2)
+    subscriber.subscription.request(1)
+
+    await subscriber.next_page()
+
+    for index in range(5):
+        table.add(create_route(str(100 + index).encode()))
+
+    subscriber.subscription.request(1)
+    await asyncio.sleep(0.05)
+
+    assert isinstance(subscriber.error, RSocketBrokerException)
+
+
+async def test_deltas_during_snapshot_do_not_overflow():
+    table = create_table(10)
+    subscriber = subscribe(table, RouteQuery(watch=True, page_size=2), max_pending_deltas=2)
+    subscriber.subscription.request(1)
+
+    pages = [await subscriber.next_page()]
+
+    for index in range(5):
+        table.add(create_route(str(100 + index).encode()))
+
+    table.remove(remove_route(b'9'))
+    subscriber.subscription.request(7)
+
+    pages.extend([await subscriber.next_page() for _ in range(7)])
+
+    assert subscriber.error is None
+    assert [page_type for page_type, _ in pages] == [RoutePageType.SNAPSHOT] * 4 + \
+           [RoutePageType.SNAPSHOT_COMPLETE] + [RoutePageType.DELTA] * 3
+
+    replica = RoutingTable()
+
+    for _, frames in pages:
+        for frame in frames:
+            replica.apply(frame)
+
+    assert route_ids(replica.find()) == route_ids(table.find())
+
+    subscriber.subscription.cancel()
@@ -0,0 +1,37 @@
+from rsocket_broker.routing_table import RoutingTable
+from tests.rsocket_broker.helpers import create_route, remove_route, route_ids
+
+
+def test_find_by_tags():
+    table = RoutingTable()
+    table.add(create_route(b'a', region='us', zone='1'))
+    table.add(create_route(b'b', region='us', zone='2'))
+    table.add(create_route(b'c', b'other', region='eu', zone='1'))
+
+    assert route_ids(table.find()) == {b'a', b'b', b'c'}
+    assert route_ids(table.find({b'region': b'us'})) == {b'a', b'b'}
+    assert route_ids(table.find({b'region': b'us', b'zone': b'1'})) == {b'a'}
+    assert route_ids(table.find({b'io.rsocket.routing.ServiceName': b'other'})) == {b'c'}
+    assert route_ids(table.find({b'region': b'asia'})) == set()
+
+
+def test_replace_and_remove():
+    notifications = []
+    table = RoutingTable()
+    table.add_listener(lambda route, remove_frame: notifications.append((route.route_id, remove_frame is None)))
+
+    table.add(create_route(b'a', region='us'))
+    table.add(create_route(b'a', region='eu'))
+
+    assert len(table) == 1
+    assert route_ids(table.find({b'region': b'us'})) == set()
+    assert route_ids(table.find({b'region': b'eu'})) == {b'a'}
+
+    assert table.remove(remove_route(b'a')) is not None
+    assert table.remove(remove_route(b'a')) is None
+
+    assert len(table) == 0
+    assert route_ids(table.find({b'region': b'eu'})) == set()
+
+    route_id = b'a'.ljust(16, b'-')
+    assert notifications == [(route_id, True), (route_id, False), (route_id, True), (route_id, False)]
@@ -0,0 +1,176 @@
+from typing import cast
+
+import pytest
+
+from rsocket.error_codes import ErrorCode
+from rsocket.exceptions import RSocketProtocolError
+
+from rsocket_broker.exceptions import RSocketBrokerUnknownTagIndex, RSocketBrokerException
+from rsocket_broker.frame import AddressFrame, parse_or_ignore
+from rsocket_broker.frame_helpers import serialize_key_value, parse_key_value_map
+from rsocket_broker.tag_table import TagTable, negotiate_tag_table_capacity, TAG_TABLE_CAPACITY_KEY, \
+    MAX_TAG_TABLE_CAPACITY
+from rsocket_broker.well_known_keys import WellKnownKeys
+from tests.rsocket_broker.helpers import data_bits, build_frame, bits, create_address_frame
+
+
+def test_key_value_map_without_table_multiple_tags():
+    key_value_map = {b'abcdefgh': b'01234567', b'io.rsocket.routing.Zone': b'a'}
+
+    serialized = serialize_key_value(key_value_map)
+    parsed, offset = parse_key_value_map(serialized + b'trailing', 0)
+
+    assert parsed == key_value_map
+    assert offset == len(serialized)
+
+
+def test_key_value_map_with_table_indexed_tag():
+    encoder_table = TagTable()
+    decoder_table = TagTable()
+    key_value_map = {b'abcdefgh': b'01234567'}
+
+    first = serialize_key_value(key_value_map, encoder_table)
+    second = serialize_key_value(key_value_map, encoder_table)
+
+    assert first == build_frame(
+        bits(1, 0, 'Not well known tag'),
+        bits(7, 7, 'tag length'),
+        data_bits(b'abcdefgh'),
+        bits(1, 0, 'Has next value'),
+        bits(7, 7, 'value length'),
+        data_bits(b'01234567'),
+    )
+
+    assert second == build_frame(
+        bits(1, 1, 'Indexed tag'),
+        bits(7, 0x20, 'Tag table index'),
+        bits(1, 0, 'Has next value'),
+        bits(7, 0, 'Unused'),
+    )
+
+    assert parse_key_value_map(first, 0, decoder_table) == (key_value_map, len(first))
+    assert parse_key_value_map(second, 0, decoder_table) == (key_value_map, len(second))
+
+
+def test_address_frame_with_tag_table():
+    encoder_table = TagTable()
+    decoder_table = TagTable()
+
+    frame = create_address_frame({
+        b'abcdefgh': b'01234567',
+        b'io.rsocket.routing.Region': b'us-east-1',
+        b'tenant': b'precog',
+    })
+
+    first = frame.serialize(tag_table=encoder_table)
+    second = frame.serialize(tag_table=encoder_table)
+
+    assert len(second) < len(first)
+    assert first == frame.serialize()
+
+    for frame_data in (first, second):
+        parsed = cast(AddressFrame, parse_or_ignore(frame_data, decoder_table))
+
+        assert parsed.origin_route_id == frame.origin_route_id
+        assert parsed.key_value_map == frame.key_value_map
+        assert parsed.metadata == frame.metadata
+        assert parsed.flag_unicast
+
+
+def test_tag_table_eviction():
+    encoder_table = TagTable(2)
+    decoder_table = TagTable(2)
+
+    for key_value_map in ({b'a': b'1'}, {b'b': b'2'}, {b'c': b'3'}, {b'a': b'1', b'c': b'3'}):
+        serialized = serialize_key_value(key_value_map, encoder_table)
+        parsed, _ = parse_key_value_map(serialized, 0, decoder_table)
+
+        assert parsed == key_value_map
+
+    assert len(encoder_table) == 2
+    assert encoder_table.get_index(b'b', b'2') is None
+    assert decoder_table.get_index(b'b', b'2') is None
+
+
+def test_tag_table_unknown_index():
+    serialized = serialize_key_value({b'a': b'1'}, _table_with(b'a', b'1'))
+
+    with pytest.raises(RSocketBrokerUnknownTagIndex):
+        parse_key_value_map(serialized, 0, TagTable())
+
+
+def test_tag_table_out_of_sync_address_frame():
+    frame_data = create_address_frame().serialize(tag_table=_table_with(b'abcdefgh', b'01234567'))
+
+    with pytest.raises(RSocketProtocolError) as exc_info:
+        parse_or_ignore(frame_data, TagTable())
+
+    assert exc_info.value.error_code == ErrorCode.CONNECTION_ERROR
+    assert isinstance(exc_info.value.__cause__, RSocketBrokerUnknownTagIndex)
+
+
+@pytest.mark.parametrize('value', (None, b''))
+def test_empty_tag_value_rejected(value):
+    tag_table = TagTable()
+
+    with pytest.raises(RSocketBrokerException):
+        serialize_key_value({b'abcdefgh': b'01234567', b'k': value}, tag_table)
+
+    assert len(tag_table) == 0
+
+
+@pytest.mark.parametrize('key_value_map', (
+        {b'a': b'1', b'b': b'x' * 200},
+        {b'a': b'1', b'x' * 200: b'b'},
+))
+def test_oversized_tag_rejected(key_value_map):
+    tag_table = TagTable()
+
+    with pytest.raises(RSocketBrokerException):
+        serialize_key_value(key_value_map, tag_table)
+
+    assert len(tag_table) == 0
+
+
+@pytest.mark.parametrize('key', (WellKnownKeys.TAG_Region, WellKnownKeys.TAG_Region.value))
+def test_well_known_key_with_table(key):
+    encoder_table = TagTable()
+    decoder_table = TagTable()
+    expected = {WellKnownKeys.TAG_Region.value.name: b'us-east-1'}
+
+    first = serialize_key_value({key: b'us-east-1'}, encoder_table)
+    second = serialize_key_value({key: b'us-east-1'}, encoder_table)
+
+    assert first == serialize_key_value(expected)
+    assert second == build_frame(
+        bits(1, 1, 'Indexed tag'),
+        bits(7, 0x20, 'Tag table index'),
+        bits(1, 0, 'Has next value'),
+        bits(7, 0, 'Unused'),
+    )
+
+    for serialized in (first, second):
+        assert parse_key_value_map(serialized, 0, decoder_table) == (expected, len(serialized))
+
+
+def test_tag_table_invalid_capacity():
+    with pytest.raises(RSocketBrokerException):
+        TagTable(MAX_TAG_TABLE_CAPACITY + 1)
+
+
+@pytest.mark.parametrize('local_capacity, key_value_map, expected', (
+        (96, {}, 0),
+        (96, {TAG_TABLE_CAPACITY_KEY: b'16'}, 16),
+        (8, {TAG_TABLE_CAPACITY_KEY: b'16'}, 8),
+        (96, {TAG_TABLE_CAPACITY_KEY: b'1000'}, MAX_TAG_TABLE_CAPACITY),
+        (96, {TAG_TABLE_CAPACITY_KEY: b'abc'}, 0),
+        (96, {TAG_TABLE_CAPACITY_KEY: b'-5'}, 0),
+))
+def test_negotiate_tag_table_capacity(local_capacity, key_value_map, expected):
+    assert negotiate_tag_table_capacity(local_capacity, key_value_map) == expected
+
+
+def _table_with(key: bytes, value: bytes) -> TagTable:
+    table = TagTable()
+    table.insert(key, value)
+    return table